@@ -1,4 +1,14 @@
-import getopt, sys, yaml
+import argparse, bisect, math, sys, yaml
+
+# Prefer the libyaml-backed loader when it's available.
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeLoader as Loader
+
+# Separator lines for the report.
+DASHES = "-"*80
+EQUALS = "="*80
 
 """
 This script uses the motif percentages to decide how to
@@ -28,26 +38,30 @@ def buildPurchase(results):
     will total up to the full amount.
     """
 
-    # Find the smallest percentages in the struct.
-    inverted = invert(results)
-    percents = sorted(inverted.keys())
+    # Sort the stocks by percentage once, smallest first, and keep
+    # the names and percentages in parallel lists. Rather than
+    # reducing the percentages left after each step, we track how
+    # much has already been bought (prev); i marks the first stock
+    # still left to buy.
+    stocks = sorted(results, key=results.get)
+    percents = [results[k] for k in stocks]
     purchases = []
     dropped = []
-    lastBuy = results.keys()
+    prev = 0.0
+    i = 0
 
-    while len(results.keys())> 0:
+    while i < len(stocks):
         # Find the smallest contributor to the final result
-        smallest =  percents.pop(0)
-        # Buy this much of everything left in result, saving it
-        purchases.append({key: smallest for (key, value) in results.items()})
-        # subtract percentage from all items in result, dropping zeroed items
-        results = {k:v-smallest for (k,v) in results.items() if v != smallest}
-        # Determine items dropped this time
-        currentBuy = results.keys()
-        dropped.append([v for v in lastBuy if v not in currentBuy])
-        lastBuy = currentBuy
-        # Reduce percentages left to purchase by amount already purchased
-        percents = [v-smallest for v in percents]
+        smallest = percents[i] - prev
+        # Buy this much of everything left, saving it. The buy keeps
+        # the stocks in motif order; anything at or above this step's
+        # percentage hasn't been used up yet.
+        purchases.append(dict.fromkeys((k for k in results if results[k] >= percents[i]), smallest))
+        # Items at the smallest percentage are used up this step
+        j = bisect.bisect_right(percents, percents[i], i)
+        dropped.append(stocks[i:j])
+        prev = percents[i]
+        i = j
 
     return purchases, dropped
 
@@ -56,120 +70,88 @@ def minPurchase(amount):
         return 5.00
     return amount
 
-def help():
-    print("slicer.py -investment dollars -file motif.yaml")
-
-def invert(original):
+def formatPurchases(purchases, dropped, investment):
     """
-    Invert a dict, making the values the keys. The old keys are
-    stored as lists so that collisions are kept.
+    formatPurchases renders the slice purchases built by buildPurchase
+    as dollar amounts for the given investment, along with the stocks
+    that drop out after each step. It returns the output lines.
     """
-    inverted = {}
-    for k in original.keys():
-        if original[k] in inverted.keys():
-            inverted[original[k]].append(k)
-        else:
-            inverted[original[k]] = [k]
-    return inverted
+    output = []
+    # Dollars per percentage point of the investment.
+    scale = investment/100
+    # drops holds the stocks dropped at the end of each step.
+    for step, (buy, drops) in enumerate(zip(purchases, dropped), 1):
+        # Every stock in a buy gets the same percentage, so any
+        # value will do. Calculate the dollar amount to spend this
+        # step. Note that Schwab has a $5 minimum purchase, so we
+        # adjust the spend up to $5 if it's less. We star any
+        # adjusted purchase.
+        amount = next(iter(buy.values()))*scale
+        required = minPurchase(amount)
+        note = ""
+        if amount != required:
+            note = '*'
+        # Show the buy and stocks to drop for this step.
+        output.append(f"Step {step}: buy {', '.join(buy)} at ${required:.2f}{note}")
+        output.append(f"\nDrop:\t{', '.join(drops)}")
+        output.append(DASHES)
+    return output
 
 def processCLI():
-    shortOpt = 'hi:f:'
-    longOpt  = ['investment=', 'file=']
-    try:
-        arguments, values = getopt.getopt(sys.argv[1:], shortOpt, longOpt)
-    except getopt.error as err:
-        print(str(err))
-        sys.exit(2)
-
-    for arg, val in arguments:
-        if arg in ("-i", "-investment"):
-            investment = float(val)
-        if arg in ('-f', '-file'):
-            with open(val) as file:
-                original = yaml.full_load(file)
-                loaded = True
-        if arg in ("-h", '-help'):
-            help()
-            sys.exit(0)
-
-    if investment is None or not loaded:
-        print("Insufficient arguments:")
-        help()
-        sys.exit(2)
-    total = 0
-    for k in original.keys():
-        total = total + original[k]
-    total = float("{0:.1f}".format(total))
+    parser = argparse.ArgumentParser(
+        description="Convert motif percentages into a series of Schwab slice purchases.")
+    parser.add_argument('-i', '--investment', type=float, required=True,
+                        help="total dollar amount to invest")
+    parser.add_argument('-f', '--file', type=argparse.FileType('r'), required=True,
+                        help="YAML file mapping stocks to motif percentages")
+    args = parser.parse_args()
+
+    investment = args.investment
+    with args.file as file:
+        original = yaml.load(file, Loader=Loader)
+
+    total = round(math.fsum(original.values()), 1)
     if total != 100.0:
-        print ("Autoscaling from {0:.2f}% to 100%".format(total))
+        print(f"Autoscaling from {total:.2f}% to 100%")
         factor = 100.0/total
-        for k in original.keys():
-            original[k] = original[k] * factor
+        original = {k: v*factor for (k, v) in original.items()}
         investment = investment / factor
         if factor < 1.0:
             which = "Increasing"
         else:
             which = "Reducing"
-        print("{0} total investment to {1:.2f}".format(which, investment))
+        print(f"{which} total investment to {investment:.2f}")
     return original, investment
 
-# Initial process: start with the Schwab distribution and
-# iterate to the Motif distribution. We operate in percentages
-# to prevent propagation of floating-point imprecision.
-# Each iteration fixes the stock with the next-highest percentage
-# and evenly distributes the remainder until we've reached the
-# original Motif distribution. We record each iteration for the
-# second pass.
-original, investment = processCLI()
-
-nextResult = 0
-fixedPoint = -1
-done = False
-
-priority = []
-inverted = invert(original)
-
-# Construct priority list for stocks. Stocks with higher percentages
-# are considered to be higher priority.
-for p in inverted.keys():
-    stocks = inverted[p]
-    for stock in stocks:
-        priority.append(stock)
-
-# Show starting percentages (which may hve been autoscaled).
-for stock in priority:
-    print("{0}:\t{1:.1f}%".format(stock, original[stock]))
-print("="*80)
-
-# Build the purchase for this set of stocks and display it.
-purchase, dropped = buildPurchase(original)
-step = 0
-for buy in purchase:
-    step = step + 1
-    # Stocks dropped at the end of this step.
-    drops = dropped.pop(0)
-    # Stocks being bought in this buy.
-    stocks = list(buy.keys())
-    # Any stock will do; we just need a valid key to get
-    # the associated percentage. Calculate the dollar amount
-    # to spend this step. Note that Schwab has a $5 minimum
-    # purchase, so we adjust the spend up to $5 if it's less.
-    # We star any adjusted purchase.
-    stock = stocks[0]
-    purchase = buy[stock]*investment/100
-    required = minPurchase(buy[stock]*investment/100)
-    note = ""
-    if purchase != required:
-        note = '*'
-    # Show the buy and stocks to drop for this step.
-    print("Step {0}: buy {1} at ${2:.2f}{3}".format(step, ', '.join(stocks), required, note))
-    print("\nDrop:\t{0}".format(', '.join(drops)))
-    print("-"*80)
-
-# Show a final summary of the amount spent per stock to cross-check against
-# the original motif spreadsheet.
-print("Summary:")
-for stock in priority:
-    print("{0}:\t${1:.2f}".format(stock, original[stock]*investment/100))
-
-sys.exit(0)
+# We operate in percentages to prevent propagation of floating-point
+# imprecision; dollar amounts are only calculated for display.
+def main():
+    original, investment = processCLI()
+
+    # Construct priority list for stocks. Stocks with higher percentages
+    # are considered to be higher priority. Each entry keeps the stock's
+    # percentage alongside it for the listings below.
+    priority = sorted(original.items(), key=lambda kv: kv[1], reverse=True)
+
+    # Show starting percentages (which may hve been autoscaled).
+    output = [f"{stock}:\t{percent:.1f}%" for (stock, percent) in priority]
+    output.append(EQUALS)
+
+    # Build the purchase for this set of stocks and display it.
+    purchases, dropped = buildPurchase(original)
+    output.extend(formatPurchases(purchases, dropped, investment))
+
+    # Show a final summary of the amount spent per stock to cross-check against
+    # the original motif spreadsheet.
+    output.append("Summary:")
+    scale = investment/100
+    for (stock, percent) in priority:
+        output.append(f"{stock}:\t${percent*scale:.2f}")
+
+    # Write everything out in one go rather than a line at a time.
+    sys.stdout.write("\n".join(output))
+    sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)